@@ -20,52 +20,120 @@ from django.shortcuts import redirect
 from telemetry import views as tv
 from telemetry.api import ingest, commands
 
+# Route tables: (route, view, name). Each group is materialized into
+# path() objects once below, so the whole routing table is visible here.
+
+# ESP32 hot paths first: every handshake/event post resolves in one probe
+_HOT_ROUTES = (
+    ('api/handshake/', ingest.handshake, 'handshake'),
+    ('api/device/events/', ingest.events, 'device_events'),  # ESP32 uses this URL
+)
+
+_API_ROUTES = (
+    ('events/', ingest.events, 'events'),
+    ('ingest/', ingest.iot_ingest, 'iot_ingest'),
+    ('bind/', ingest.bind_device_to_machine, 'bind_device'),
+    ('export/', ingest.export_data, 'export_data'),
+    ('flush/', ingest.flush_all_data, 'flush_data'),
+    ('flush-except-admin/', ingest.flush_all_but_admin, 'flush_except_admin'),
+)
+
+# api/device/<device_id>/commands/ - literal routes before the <command_id> capture.
+# telemetry.fast_router builds its dispatch trie from these two names.
+_DEVICE_COMMANDS_PREFIX = 'device/<str:device_id>/commands/'
+_DEVICE_COMMAND_ROUTES = (
+    ('', commands.get_device_commands, 'get_device_commands'),
+    ('create/', commands.create_device_command, 'create_device_command'),
+    ('status/', commands.get_command_status, 'get_command_status'),
+    ('<str:command_id>/', commands.report_command_result, 'report_command_result'),
+)
+
+_API_DEVICES_ROUTES = (
+    ('', ingest.devices_data_api, 'devices_api'),
+    ('online/', ingest.devices_online_api, 'devices_online_api'),
+)
+
+_API_MACHINES_ROUTES = (
+    ('unregistered/', ingest.machines_unregistered_api, 'machines_unregistered_api'),
+    ('<int:machine_id>/logs/', tv.machine_logs_api, 'machine_logs_api'),
+)
+
+_API_COMMANDS_ROUTES = (
+    ('bulk/', commands.bulk_create_commands, 'bulk_create_commands'),
+    ('<str:command_id>/retry/', commands.retry_command, 'retry_command'),
+)
+
+_OUTLETS_ROUTES = (
+    ('', tv.outlets_page, 'outlets_page'),
+    ('create/', tv.outlets_create, 'outlets_create'),
+    ('<int:outlet_id>/manage/', tv.outlet_manage, 'outlet_manage'),
+    ('<int:outlet_id>/assign/', tv.outlet_assign_machine, 'outlet_assign_machine'),
+)
+
+_MACHINES_ROUTES = (
+    ('', tv.machines_page, 'machines_page'),
+    ('create/', tv.machines_create, 'machines_create'),
+)
+
+# machines/<int:machine_id>/
+_MACHINE_ROUTES = (
+    ('assign/', tv.machine_assign, 'machine_assign'),
+    ('unassign/', tv.machine_unassign, 'machine_unassign'),
+    ('delete/', tv.machine_delete, 'machine_delete'),
+    ('logs/', tv.machine_treatment_logs, 'machine_treatment_logs'),
+)
+
+# devices/<str:device_id>/
+_DEVICE_ROUTES = (
+    ('', tv.device_detail, 'device_detail'),
+    ('assign/', tv.device_assign, 'device_assign'),
+    ('unassign/', tv.device_unassign, 'device_unassign'),
+    ('commands/', tv.device_commands, 'device_commands'),
+    ('commands/create/', tv.create_command, 'create_command'),
+)
+
+# Auth pages (HTMX)
+_LOGIN_ROUTES = (
+    ('', tv.login_page, 'login_page'),
+    ('submit/', tv.login_submit, 'login_submit'),
+)
+
+_REGISTER_ROUTES = (
+    ('', tv.register_page, 'register_page'),
+    ('submit/', tv.register_submit, 'register_submit'),
+)
+
+
+def _paths(routes):
+    return [path(route, view, name=name) for route, view, name in routes]
+
+
 urlpatterns = [
+    *_paths(_HOT_ROUTES),
     path('admin/', admin.site.urls),
-path('', tv.dashboard, name='root'),
-path('dashboard/', tv.dashboard, name='dashboard'),
-path('outlets/', tv.outlets_page, name='outlets_page'),
-path('outlets/create/', tv.outlets_create, name='outlets_create'),
-path('machines/', tv.machines_page, name='machines_page'),
-path('machines/create/', tv.machines_create, name='machines_create'),
-path('machines/<int:machine_id>/assign/', tv.machine_assign, name='machine_assign'),
-path('machines/<int:machine_id>/unassign/', tv.machine_unassign, name='machine_unassign'),
-path('machines/<int:machine_id>/delete/', tv.machine_delete, name='machine_delete'),
-path('machines/<int:machine_id>/logs/', tv.machine_treatment_logs, name='machine_treatment_logs'),
-path('api/machines/<int:machine_id>/logs/', tv.machine_logs_api, name='machine_logs_api'),
-path('outlets/<int:outlet_id>/manage/', tv.outlet_manage, name='outlet_manage'),
-path('outlets/<int:outlet_id>/assign/', tv.outlet_assign_machine, name='outlet_assign_machine'),
-    # Devices pages
-    path('devices/', tv.devices_page, name='devices_page'),
-    path('devices/<str:device_id>/assign/', tv.device_assign, name='device_assign'),
-    path('devices/<str:device_id>/unassign/', tv.device_unassign, name='device_unassign'),
-    path('devices/<str:device_id>/commands/', tv.device_commands, name='device_commands'),
-    path('devices/<str:device_id>/commands/create/', tv.create_command, name='create_command'),
-    path('devices/<str:device_id>/', tv.device_detail, name='device_detail'),
-    # Auth pages (HTMX)
-    path('login/', tv.login_page, name='login_page'),
-    path('login/submit/', tv.login_submit, name='login_submit'),
-    path('register/', tv.register_page, name='register_page'),
-    path('register/submit/', tv.register_submit, name='register_submit'),
-    
-    # API endpoints for ESP32 devices
-    path('api/handshake/', ingest.handshake, name='handshake'),
-    path('api/events/', ingest.events, name='events'),
-    path('api/device/events/', ingest.events, name='device_events'),  # ESP32 uses this URL
-    path('api/ingest/', ingest.iot_ingest, name='iot_ingest'),
-    path('api/devices/', ingest.devices_data_api, name='devices_api'),
-    path('api/devices/online/', ingest.devices_online_api, name='devices_online_api'),
-    path('api/machines/unregistered/', ingest.machines_unregistered_api, name='machines_unregistered_api'),
-    path('api/bind/', ingest.bind_device_to_machine, name='bind_device'),
-    path('api/export/', ingest.export_data, name='export_data'),
-    path('api/flush/', ingest.flush_all_data, name='flush_data'),
-    path('api/flush-except-admin/', ingest.flush_all_but_admin, name='flush_except_admin'),
-    
-    # Command API endpoints
-    path('api/device/<str:device_id>/commands/', commands.get_device_commands, name='get_device_commands'),
-    path('api/device/<str:device_id>/commands/<str:command_id>/', commands.report_command_result, name='report_command_result'),
-    path('api/device/<str:device_id>/commands/create/', commands.create_device_command, name='create_device_command'),
-    path('api/device/<str:device_id>/commands/status/', commands.get_command_status, name='get_command_status'),
-    path('api/commands/<str:command_id>/retry/', commands.retry_command, name='retry_command'),
-    path('api/commands/bulk/', commands.bulk_create_commands, name='bulk_create_commands'),
+
+    # API endpoints
+    path('api/', include([
+        *_paths(_API_ROUTES),
+        path(_DEVICE_COMMANDS_PREFIX, include(_paths(_DEVICE_COMMAND_ROUTES))),
+        path('devices/', include(_paths(_API_DEVICES_ROUTES))),
+        path('machines/', include(_paths(_API_MACHINES_ROUTES))),
+        path('commands/', include(_paths(_API_COMMANDS_ROUTES))),
+    ])),
+
+    # Dashboard pages
+    path('dashboard/', tv.dashboard, name='dashboard'),
+    path('outlets/', include(_paths(_OUTLETS_ROUTES))),
+    path('machines/', include([
+        *_paths(_MACHINES_ROUTES),
+        path('<int:machine_id>/', include(_paths(_MACHINE_ROUTES))),
+    ])),
+    path('devices/', include([
+        path('', tv.devices_page, name='devices_page'),
+        path('<str:device_id>/', include(_paths(_DEVICE_ROUTES))),
+    ])),
+    path('login/', include(_paths(_LOGIN_ROUTES))),
+    path('register/', include(_paths(_REGISTER_ROUTES))),
+
+    path('', tv.dashboard, name='root'),
 ]
@@ -1,16 +1,58 @@
 """
 Command API endpoints for ESP32 device communication
 """
+import logging
 import secrets
-import uuid
 from datetime import datetime, timedelta
 from django.utils import timezone
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import Count, Q
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from telemetry.models import Device, Command
-from telemetry.api.ingest import _auth_device
+from telemetry.api.ingest import _auth_device_ref
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on commands handed to an ESP32 in a single poll; the rest follow on the next poll
+MAX_COMMANDS_PER_POLL = 32
+
+# current_counters keys sent by the ESP32 -> DeviceStatus fields
+_COUNTER_FIELDS = (
+    ('basic', 'current_count_basic'),
+    ('standard', 'current_count_standard'),
+    ('premium', 'current_count_premium'),
+)
+
+_VALID_COMMAND_TYPES = frozenset(choice[0] for choice in Command.COMMAND_TYPES)
+_INVALID_COMMAND_TYPE_MSG = f"Invalid command type. Valid types: {[choice[0] for choice in Command.COMMAND_TYPES]}"
+
+# Short-lived marker that a device has nothing pending, so idle polls skip the SELECT
+PENDING_COMMANDS_CACHE_TTL = 2
+
+
+def _pending_commands_cache_key(device_id):
+    return f"pending:{device_id}"
+
+
+def invalidate_pending_commands(*device_ids):
+    """Drop the 'nothing pending' marker for devices that just gained a pending command."""
+    cache.delete_many([_pending_commands_cache_key(device_id) for device_id in device_ids])
+
+
+# last_poll / last_seen only feed online status (minutes granularity), so write them at most this often
+LAST_SEEN_WRITE_INTERVAL = 30
+
+
+def _due_for_write(key, now):
+    """Return True (and record now) when key was last written over LAST_SEEN_WRITE_INTERVAL seconds ago."""
+    last = cache.get(key)
+    if last is not None and (now - last).total_seconds() < LAST_SEEN_WRITE_INTERVAL:
+        return False
+    cache.set(key, now, LAST_SEEN_WRITE_INTERVAL * 2)
+    return True
 
 
 @api_view(["GET"])
@@ -20,56 +62,71 @@ def get_device_commands(request, device_id):
     ESP32 polls this endpoint to get pending commands
     GET /api/device/{device_id}/commands/
     """
-    # Authenticate device
-    device = _auth_device(request)
-    if not device or device.device_id != device_id:
+    # Authenticate device (cached per token; only the pk and device_id are needed here)
+    ref = _auth_device_ref(request)
+    if not ref or ref[1] != device_id:
         return Response({"detail": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+    device_pk = ref[0]
+    # One timestamp for the whole poll: filter, last_poll, sent_at and the response
+    now = timezone.now()
     
-    # Update last poll time
+    # Update last poll time, fetch pending commands and mark them sent in one transaction
     from telemetry.models import DeviceStatus
-    ds, _ = DeviceStatus.objects.get_or_create(device_id=device.device_id)
-    ds.last_poll = timezone.now()
-    ds.save()
+    cache_key = _pending_commands_cache_key(device_id)
+    nothing_pending = cache.get(cache_key) == []
+    with transaction.atomic():
+        if _due_for_write(f"lastpoll:{device_id}", now):
+            # last_seen is auto_now, which update() skips, so it is set explicitly
+            updated = DeviceStatus.objects.filter(device_id=device_id).update(last_poll=now, last_seen=now)
+            if not updated:
+                DeviceStatus.objects.get_or_create(device_id=device_id, defaults={'last_poll': now})
+
+        # Get pending commands for this device as plain dicts (no model instantiation)
+        commands = [] if nothing_pending else list(Command.objects.filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gte=now),
+            device=device_pk,
+            status='pending'
+        ).order_by('-priority', 'created_at').values(
+            'command_id', 'command_type', 'priority', 'payload', 'description', 'created_at', 'expires_at'
+        )[:MAX_COMMANDS_PER_POLL])
+
+        # Convert to response format
+        command_list = []
+        for cmd in commands:
+            command_data = {
+                'id': cmd['command_id'],  # Changed from 'command_id' to 'id' for ESP32 compatibility
+                'command_id': cmd['command_id'],  # Keep both for backward compatibility
+                'command_type': cmd['command_type'],
+                'priority': cmd['priority'],
+                'payload': cmd['payload'],
+                'description': cmd['description'],
+                'created_at': cmd['created_at'],
+                'expires_at': cmd['expires_at'],
+            }
+            command_list.append(command_data)
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Sending command %s (%s) to device %s", cmd['command_id'], cmd['command_type'], device_id)
+
+        # Mark all fetched commands as sent with a single UPDATE
+        if commands:
+            Command.objects.filter(
+                device=device_pk,
+                command_id__in=[cmd['command_id'] for cmd in commands],
+                status='pending'
+            ).update(status='sent', sent_at=now)
     
-    # Get pending commands for this device
-    commands = Command.objects.filter(
-        device=device,
-        status='pending'
-    ).exclude(
-        expires_at__lt=timezone.now()
-    ).order_by('-priority', 'created_at')
-    
-    # Convert to response format
-    command_list = []
-    for cmd in commands:
-        command_data = {
-            'id': cmd.command_id,  # Changed from 'command_id' to 'id' for ESP32 compatibility
-            'command_id': cmd.command_id,  # Keep both for backward compatibility
-            'command_type': cmd.command_type,
-            'priority': cmd.priority,
-            'payload': cmd.payload,
-            'description': cmd.description,
-            'created_at': cmd.created_at.isoformat(),
-            'expires_at': cmd.expires_at.isoformat() if cmd.expires_at else None,
-        }
-        command_list.append(command_data)
-        
-        # Debug logging
-        print(f"📤 SENDING COMMAND TO ESP32:")
-        print(f"  Command ID: {cmd.command_id}")
-        print(f"  Command Type: {cmd.command_type}")
-        print(f"  Device: {device_id}")
-        
-        # Mark command as sent
-        cmd.status = 'sent'
-        cmd.sent_at = timezone.now()
-        cmd.save()
+    # Below the cap every pending command was just marked sent, so the device has nothing left.
+    # Only that empty result is cached; a non-empty list must never be handed out twice. The
+    # marker is only set after a real SELECT, so polls served from it never extend its TTL.
+    if not nothing_pending and len(commands) < MAX_COMMANDS_PER_POLL:
+        cache.set(cache_key, [], PENDING_COMMANDS_CACHE_TTL)
     
     return Response({
         'commands': command_list,
         'count': len(command_list),
         'device_id': device_id,
-        'timestamp': timezone.now().isoformat()
+        'timestamp': now
     })
 
 
@@ -80,76 +137,71 @@ def report_command_result(request, device_id, command_id):
     ESP32 reports command execution result
     PUT /api/device/{device_id}/commands/{command_id}/
     """
-    # Debug logging
-    print(f"🔍 COMMAND RESULT DEBUG:")
-    print(f"  Device ID: {device_id}")
-    print(f"  Command ID: {command_id}")
-    print(f"  Request data: {request.data}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Command result from device %s for command %s: %s", device_id, command_id, request.data)
     
-    # Authenticate device
-    device = _auth_device(request)
-    if not device or device.device_id != device_id:
-        print(f"❌ Authentication failed for device {device_id}")
+    # Authenticate device (cached per token)
+    ref = _auth_device_ref(request)
+    if not ref or ref[1] != device_id:
+        logger.debug("Authentication failed for device %s", device_id)
         return Response({"detail": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+    device_pk = ref[0]
     
     # Check if command_id is null or invalid
     if not command_id or command_id == 'null' or command_id == 'None':
-        print(f"❌ Invalid command_id: '{command_id}'")
+        logger.debug("Invalid command_id: %r", command_id)
         return Response({
             "detail": f"Invalid command_id: '{command_id}'. Command ID cannot be null or empty."
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        command = Command.objects.get(command_id=command_id, device=device)
-        print(f"✅ Found command: {command.command_id} - {command.command_type}")
-    except Command.DoesNotExist:
-        print(f"❌ Command not found: {command_id} for device {device_id}")
-        # List all commands for this device for debugging
-        all_commands = Command.objects.filter(device=device)
-        print(f"  Available commands for device {device_id}:")
-        for cmd in all_commands:
-            print(f"    - {cmd.command_id}: {cmd.command_type} ({cmd.status})")
-        return Response({"detail": "Command not found"}, status=status.HTTP_404_NOT_FOUND)
-    
     # Get result data
     success = request.data.get('success', False)
     response_data = request.data.get('response_data', {})
     error_message = request.data.get('error_message', '')
     current_counters = request.data.get('current_counters', {})
+    now = timezone.now()
     
-    # Update command status
-    if success:
-        command.status = 'executed'
-        command.executed_at = timezone.now()
-        command.response_data = response_data
-        command.error_message = ''
-        
-        # Update device last_seen
-        device.last_seen = timezone.now()
-        device.save()
+    # Command, Device and DeviceStatus writes commit together; the row lock serializes ESP32 retries
+    with transaction.atomic():
+        try:
+            # Only the columns written below; the device pk is already known from auth
+            command = Command.objects.select_for_update().only(
+                'status', 'executed_at', 'response_data', 'error_message'
+            ).get(command_id=command_id, device=device_pk)
+            logger.debug("Found command %s", command_id)
+        except Command.DoesNotExist:
+            logger.debug("Command %s not found for device %s", command_id, device_id)
+            return Response({"detail": "Command not found"}, status=status.HTTP_404_NOT_FOUND)
         
-        # Update device status with current counters if provided (for RESET_COUNTERS, etc.)
-        if current_counters:
+        # Update command status
+        if success:
+            command.status = 'executed'
+            command.executed_at = now
+            command.response_data = response_data
+            command.error_message = ''
+            command.save(update_fields=['status', 'executed_at', 'response_data', 'error_message'])
+            
+            # Update device last_seen (debounced; counters below are always written)
+            stamp_last_seen = _due_for_write(f"lastseen:{device_id}", now)
+            if stamp_last_seen:
+                Device.objects.filter(pk=device_pk).update(last_seen=now)
+            
+            # Update device status with current counters if provided (for RESET_COUNTERS, etc.) and last_seen
             from telemetry.models import DeviceStatus
-            ds, _ = DeviceStatus.objects.get_or_create(device_id=device.device_id)
-            ds.current_count_basic = current_counters.get("basic", ds.current_count_basic)
-            ds.current_count_standard = current_counters.get("standard", ds.current_count_standard)
-            ds.current_count_premium = current_counters.get("premium", ds.current_count_premium)
-            ds.last_seen = timezone.now()
-            ds.save()
-            print(f"🔍 COMMAND RESULT - UPDATED COUNTERS: Basic={ds.current_count_basic}, Standard={ds.current_count_standard}, Premium={ds.current_count_premium}")
+            ds_fields = {field: current_counters[key] for key, field in _COUNTER_FIELDS if key in current_counters} if current_counters else {}
+            if ds_fields or stamp_last_seen:
+                ds_fields['last_seen'] = now
+                # Single UPDATE in the common case; no read-modify-write of the counters
+                updated = DeviceStatus.objects.filter(device_id=device_id).update(**ds_fields)
+                if not updated:
+                    DeviceStatus.objects.get_or_create(device_id=device_id, defaults=ds_fields)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Updated device status for %s: %s", device_id, ds_fields)
         else:
-            # Still update DeviceStatus.last_seen even without current_counters
-            from telemetry.models import DeviceStatus
-            ds, _ = DeviceStatus.objects.get_or_create(device_id=device.device_id)
-            ds.last_seen = timezone.now()
-            ds.save()
-    else:
-        command.status = 'failed'
-        command.error_message = error_message
-        command.response_data = response_data
-    
-    command.save()
+            command.status = 'failed'
+            command.error_message = error_message
+            command.response_data = response_data
+            command.save(update_fields=['status', 'error_message', 'response_data'])
     
     return Response({
         'status': 'updated',
@@ -178,14 +230,13 @@ def create_device_command(request, device_id):
     expires_in_hours = request.data.get('expires_in_hours', 24)
     
     # Validate command type
-    valid_types = [choice[0] for choice in Command.COMMAND_TYPES]
-    if command_type not in valid_types:
+    if command_type not in _VALID_COMMAND_TYPES:
         return Response({
-            "detail": f"Invalid command type. Valid types: {valid_types}"
+            "detail": _INVALID_COMMAND_TYPE_MSG
         }, status=status.HTTP_400_BAD_REQUEST)
     
     # Generate unique command ID
-    command_id = f"{device_id}-{command_type}-{uuid.uuid4().hex[:8]}"
+    command_id = f"{device_id}-{command_type}-{secrets.token_hex(4)}"
     
     # Calculate expiration time
     expires_at = timezone.now() + timedelta(hours=expires_in_hours)
@@ -201,13 +252,14 @@ def create_device_command(request, device_id):
         expires_at=expires_at,
         created_by=request.user
     )
+    invalidate_pending_commands(device_id)
     
     return Response({
         'status': 'created',
         'command_id': command_id,
         'command_type': command_type,
         'device_id': device_id,
-        'expires_at': expires_at.isoformat()
+        'expires_at': expires_at
     })
 
 
@@ -223,32 +275,24 @@ def get_command_status(request, device_id):
     except Device.DoesNotExist:
         return Response({"detail": "Device not found"}, status=status.HTTP_404_NOT_FOUND)
     
-    # Get command statistics
+    # Get command statistics in a single aggregate query
     commands = Command.objects.filter(device=device)
     
-    stats = {
-        'total': commands.count(),
-        'pending': commands.filter(status='pending').count(),
-        'sent': commands.filter(status='sent').count(),
-        'executed': commands.filter(status='executed').count(),
-        'failed': commands.filter(status='failed').count(),
-        'timeout': commands.filter(status='timeout').count(),
-    }
+    stats = commands.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending')),
+        sent=Count('id', filter=Q(status='sent')),
+        executed=Count('id', filter=Q(status='executed')),
+        failed=Count('id', filter=Q(status='failed')),
+        timeout=Count('id', filter=Q(status='timeout')),
+    )
     
-    # Get recent commands
-    recent_commands = commands.order_by('-created_at')[:10]
-    command_list = []
-    for cmd in recent_commands:
-        command_list.append({
-            'command_id': cmd.command_id,
-            'command_type': cmd.command_type,
-            'status': cmd.status,
-            'priority': cmd.priority,
-            'created_at': cmd.created_at.isoformat(),
-            'executed_at': cmd.executed_at.isoformat() if cmd.executed_at else None,
-            'error_message': cmd.error_message,
-            'retry_count': cmd.retry_count,
-        })
+    # Get recent commands as plain dicts (no model instantiation)
+    recent_commands = commands.order_by('-created_at').values(
+        'command_id', 'command_type', 'status', 'priority', 'created_at',
+        'executed_at', 'error_message', 'retry_count'
+    )[:10]
+    command_list = list(recent_commands)
     
     return Response({
         'device_id': device_id,
@@ -265,7 +309,7 @@ def retry_command(request, command_id):
     POST /api/commands/{command_id}/retry/
     """
     try:
-        command = Command.objects.get(command_id=command_id)
+        command = Command.objects.select_related('device').get(command_id=command_id)
     except Command.DoesNotExist:
         return Response({"detail": "Command not found"}, status=status.HTTP_404_NOT_FOUND)
     
@@ -280,7 +324,8 @@ def retry_command(request, command_id):
     command.sent_at = None
     command.executed_at = None
     command.error_message = ''
-    command.save()
+    command.save(update_fields=['status', 'retry_count', 'sent_at', 'executed_at', 'error_message'])
+    invalidate_pending_commands(command.device.device_id)
     
     return Response({
         'status': 'retried',
@@ -309,45 +354,52 @@ def bulk_create_commands(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     # Validate command type
-    valid_types = [choice[0] for choice in Command.COMMAND_TYPES]
-    if command_type not in valid_types:
+    if command_type not in _VALID_COMMAND_TYPES:
         return Response({
-            "detail": f"Invalid command type. Valid types: {valid_types}"
+            "detail": _INVALID_COMMAND_TYPE_MSG
         }, status=status.HTTP_400_BAD_REQUEST)
     
+    # Resolve all devices in one query
+    devices = Device.objects.filter(device_id__in=device_ids).in_bulk(field_name='device_id')
+    
+    # Calculate expiration time
+    expires_at = timezone.now() + timedelta(hours=expires_in_hours)
+    
+    new_commands = []
+    used_ids = set()
     created_commands = []
     failed_devices = []
+    for device_id in device_ids:
+        device = devices.get(device_id)
+        if device is None:
+            failed_devices.append(device_id)
+            continue
+        
+        # Generate unique command ID, regenerating on the rare in-batch collision
+        command_id = f"{device_id}-{command_type}-{secrets.token_hex(4)}"
+        while command_id in used_ids:
+            command_id = f"{device_id}-{command_type}-{secrets.token_hex(4)}"
+        used_ids.add(command_id)
+        
+        new_commands.append(Command(
+            command_id=command_id,
+            device=device,
+            command_type=command_type,
+            priority=priority,
+            payload=payload,
+            description=description,
+            expires_at=expires_at,
+            created_by=request.user
+        ))
+        created_commands.append({
+            'command_id': command_id,
+            'device_id': device_id
+        })
     
+    # Create all commands with batched INSERTs
     with transaction.atomic():
-        for device_id in device_ids:
-            try:
-                device = Device.objects.get(device_id=device_id)
-                
-                # Generate unique command ID
-                command_id = f"{device_id}-{command_type}-{uuid.uuid4().hex[:8]}"
-                
-                # Calculate expiration time
-                expires_at = timezone.now() + timedelta(hours=expires_in_hours)
-                
-                # Create command
-                command = Command.objects.create(
-                    command_id=command_id,
-                    device=device,
-                    command_type=command_type,
-                    priority=priority,
-                    payload=payload,
-                    description=description,
-                    expires_at=expires_at,
-                    created_by=request.user
-                )
-                
-                created_commands.append({
-                    'command_id': command_id,
-                    'device_id': device_id
-                })
-                
-            except Device.DoesNotExist:
-                failed_devices.append(device_id)
+        Command.objects.bulk_create(new_commands, batch_size=500)
+    invalidate_pending_commands(*(cmd['device_id'] for cmd in created_commands))
     
     return Response({
         'status': 'bulk_created',
@@ -3,16 +3,35 @@ from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from datetime import datetime, timedelta
-from django.db import transaction
+from collections import defaultdict
+from functools import lru_cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q
+from django.core.cache import cache
 from telemetry.models import TelemetryEvent, DeviceStatus, UsageStatistics, Device, Machine
+import hashlib
+import logging
 import secrets
-from django.contrib.auth.models import User
+from django.contrib.auth import get_user_model
 from rest_framework.permissions import IsAuthenticated
 
+logger = logging.getLogger(__name__)
 
-def _get_device_status(device_status):
-    """Determine device status based on last_poll timestamp (ESP32 command polling)"""
+_TREATMENTS = frozenset({"BASIC", "STANDARD", "PREMIUM"})
+_INGEST_MODES = _TREATMENTS | {"status"}
+
+
+# A device counts as online while it has polled (or been seen) within this window
+ONLINE_WINDOW = timedelta(minutes=16)
+
+
+def _get_device_status(device_status, now=None):
+    """Determine device status based on last_poll timestamp (ESP32 command polling).
+
+    List views pass one ``now`` for every device instead of reading the clock per row.
+    """
     if not device_status:
         return 'offline'
     
@@ -24,10 +43,11 @@ def _get_device_status(device_status):
         if not poll_time:
             return 'offline'
     
-    now = timezone.now()
+    if now is None:
+        now = timezone.now()
     time_diff = now - poll_time
     
-    if time_diff <= timedelta(minutes=16):
+    if time_diff <= ONLINE_WINDOW:
         return 'online'
     elif time_diff <= timedelta(hours=1):
         return 'idle'
@@ -37,8 +57,13 @@ def _get_device_status(device_status):
 
 def _safe_number(value):
     """Safely convert value to int, return None if invalid."""
+    if value is None:
+        return None
+    if type(value) is int:
+        return value
     try:
-        return int(value) if value is not None and str(value).strip() else None
+        # Empty and whitespace-only strings raise ValueError, so no str().strip() pre-check is needed
+        return int(value)
     except (ValueError, TypeError):
         return None
 
@@ -60,6 +85,9 @@ def iot_ingest(request):
     sd_available_raw = request.data.get("sd_available", None)
     rtc_available = None if rtc_available_raw is None else str(rtc_available_raw).lower() == "true"
     sd_available = None if sd_available_raw is None else str(sd_available_raw).lower() == "true"
+    # Parse each numeric field once and reuse it for DeviceStatus and the event row
+    c1, c2, c3 = _safe_number(count1), _safe_number(count2), _safe_number(count3)
+    t1, t2, t3 = _safe_number(type1), _safe_number(type2), _safe_number(type3)
 
     if not macaddr:
         return Response({"detail": "macaddr required"}, status=status.HTTP_400_BAD_REQUEST)
@@ -70,68 +98,90 @@ def iot_ingest(request):
         if parsed:
             occurred_at = parsed
 
-    device_status, created = DeviceStatus.objects.get_or_create(
-        device_id=str(macaddr),
-        defaults={
-            'wifi_connected': True,
-            'rtc_available': bool(rtc_available) if rtc_available is not None else False,
-            'sd_card_available': bool(sd_available) if sd_available is not None else False,
-            'current_count_basic': _safe_number(count1) or 0,
-            'current_count_standard': _safe_number(count2) or 0,
-            'current_count_premium': _safe_number(count3) or 0,
-            'device_timestamp': device_timestamp,
-        }
-    )
-    if not created:
-        device_status.wifi_connected = True
+    # All of this ingest's writes share one transaction (one commit instead of three or four)
+    with transaction.atomic():
+        # Single INSERT ... ON CONFLICT (device_id) DO UPDATE; rtc/sd flags are only
+        # overwritten on an existing row when the device actually reported them
+        update_fields = [
+            'wifi_connected', 'current_count_basic', 'current_count_standard',
+            'current_count_premium', 'device_timestamp', 'last_seen',
+        ]
         if rtc_available is not None:
-            device_status.rtc_available = rtc_available
+            update_fields.append('rtc_available')
         if sd_available is not None:
-            device_status.sd_card_available = sd_available
-        device_status.current_count_basic = _safe_number(count1) or 0
-        device_status.current_count_standard = _safe_number(count2) or 0
-        device_status.current_count_premium = _safe_number(count3) or 0
-        device_status.device_timestamp = device_timestamp
-        device_status.save()
-
-    event_type = mode if mode in {"BASIC", "STANDARD", "PREMIUM", "status"} else "status"
-    if event_type != "status":
-        TelemetryEvent.objects.create(
-            device_id=str(macaddr),
-            event_type=event_type,
-            count_basic=_safe_number(count1),
-            count_standard=_safe_number(count2),
-            count_premium=_safe_number(count3),
-            occurred_at=occurred_at,
-            device_timestamp=device_timestamp,
-            wifi_status=True,
-            payload={
-                "type1": _safe_number(type1),
-                "type2": _safe_number(type2),
-                "type3": _safe_number(type3),
-            },
+            update_fields.append('sd_card_available')
+        DeviceStatus.objects.bulk_create(
+            [DeviceStatus(
+                device_id=str(macaddr),
+                wifi_connected=True,
+                rtc_available=bool(rtc_available),
+                sd_card_available=bool(sd_available),
+                current_count_basic=c1 or 0,
+                current_count_standard=c2 or 0,
+                current_count_premium=c3 or 0,
+                device_timestamp=device_timestamp,
+            )],
+            update_conflicts=True,
+            unique_fields=['device_id'],
+            update_fields=update_fields,
         )
-        _update_daily_statistics(str(macaddr), event_type, occurred_at)
+
+        event_type = mode if mode in _INGEST_MODES else "status"
+        if event_type != "status":
+            TelemetryEvent.objects.create(
+                device_id=str(macaddr),
+                event_type=event_type,
+                count_basic=c1,
+                count_standard=c2,
+                count_premium=c3,
+                occurred_at=occurred_at,
+                device_timestamp=device_timestamp,
+                wifi_status=True,
+                payload={
+                    "type1": t1,
+                    "type2": t2,
+                    "type3": t3,
+                },
+            )
+            _update_daily_statistics(str(macaddr), event_type, occurred_at)
+    invalidate_devices_payload()
 
     return Response({"status": "ok"})
 
 
 def _parse_device_timestamp(value):
+    if not value:
+        return None
+    return _parse_device_timestamp_str(str(value))
+
+
+# ESP32 bursts repeat the same timestamp strings; parsing is pure, so memoize on the raw string
+@lru_cache(maxsize=4096)
+def _parse_device_timestamp_str(value):
+    """Parse the firmware's zero-padded "YYYY-MM-DD HH:MM:SS" timestamp.
+
+    Stricter than the strptime("%Y-%m-%d %H:%M:%S") it replaced: unpadded
+    fields ("2024-1-2 3:04:05") and other ISO forms return None.
+    """
+    # fromisoformat parses in C; the length/separator check pins it to the firmware format
+    if len(value) != 19 or value[10] != " ":
+        return None
     try:
-        if not value:
-            return None
-        dt = datetime.strptime(str(value), "%Y-%m-%d %H:%M:%S")
-        return timezone.make_aware(dt)
+        return timezone.make_aware(datetime.fromisoformat(value))
     except Exception:
         return None
 
 
 def _parse_timestamp(value):
+    return _parse_timestamp_str(str(value))
+
+
+@lru_cache(maxsize=4096)
+def _parse_timestamp_str(value):
     try:
-        if str(value).isdigit():
+        if value.isdigit():
             return timezone.datetime.fromtimestamp(int(value), tz=timezone.utc)
-        from django.utils.dateparse import parse_datetime
-        dt = parse_datetime(str(value))
+        dt = parse_datetime(value)
         if dt and dt.tzinfo is None:
             dt = dt.replace(tzinfo=timezone.utc)
         return dt
@@ -139,24 +189,41 @@ def _parse_timestamp(value):
         return None
 
 
+_USAGE_COUNT_FIELDS = {
+    "BASIC": "basic_count",
+    "STANDARD": "standard_count",
+    "PREMIUM": "premium_count",
+}
+
+
 def _update_daily_statistics(device_id, event_type, occurred_at):
     try:
-        date = occurred_at.date()
-        stats, created = UsageStatistics.objects.get_or_create(
-            device_id=device_id,
-            date=date,
-            defaults={}
-        )
-        if event_type == "BASIC":
-            stats.basic_count += 1
-        elif event_type == "STANDARD":
-            stats.standard_count += 1
-        elif event_type == "PREMIUM":
-            stats.premium_count += 1
-        stats.total_count += 1
-        stats.save()
+        # Savepoint, so a swallowed error here doesn't break the caller's transaction
+        with transaction.atomic():
+            date = occurred_at.date()
+            # Increment in SQL so concurrent ingests for the same device/day don't lose updates
+            increments = {'total_count': F('total_count') + 1, 'updated_at': timezone.now()}
+            field = _USAGE_COUNT_FIELDS.get(event_type)
+            if field:
+                increments[field] = F(field) + 1
+            stats = UsageStatistics.objects.filter(device_id=device_id, date=date)
+            if not stats.update(**increments):
+                defaults = {'total_count': 1}
+                if field:
+                    defaults[field] = 1
+                _, created = UsageStatistics.objects.get_or_create(device_id=device_id, date=date, defaults=defaults)
+                if not created:
+                    # Lost the race to create today's row; apply the increment to it
+                    stats.update(**increments)
     except Exception as e:
-        print(f"Error updating daily statistics: {e}")
+        logger.warning("Error updating daily statistics: %s", e)
+
+
+class _Echo:
+    """File-like object whose write() hands the CSV line back instead of storing it."""
+
+    def write(self, value):
+        return value
 
 
 @api_view(["GET"])
@@ -172,34 +239,50 @@ def export_data(request):
         device_id=device_id,
         occurred_at__gte=start_date,
         occurred_at__lte=end_date
-    ).order_by('occurred_at')
+    ).order_by('occurred_at').values_list(
+        'occurred_at', 'device_timestamp', 'event_type', 'count_basic', 'count_standard', 'count_premium', 'wifi_status'
+    )
     import csv
-    from django.http import HttpResponse
-    response = HttpResponse(content_type='text/csv')
+    import itertools
+    from django.http import StreamingHttpResponse
+    # Stream rows as they are read instead of buffering the whole CSV in memory
+    writer = csv.writer(_Echo())
+    rows = itertools.chain(
+        [writer.writerow(['Timestamp', 'Device Timestamp', 'Event Type', 'Basic Count', 'Standard Count', 'Premium Count', 'WiFi Status'])],
+        (writer.writerow([
+            occurred_at.isoformat(),
+            device_timestamp or '',
+            event_type,
+            count_basic or 0,
+            count_standard or 0,
+            count_premium or 0,
+            'Connected' if wifi_status else 'Disconnected'
+        ]) for occurred_at, device_timestamp, event_type, count_basic, count_standard, count_premium, wifi_status
+            in events.iterator(chunk_size=2000)),
+    )
+    response = StreamingHttpResponse(rows, content_type='text/csv')
     response['Content-Disposition'] = f'attachment; filename="telemetry_{device_id}_{start_date.date()}_to_{end_date.date()}.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['Timestamp', 'Device Timestamp', 'Event Type', 'Basic Count', 'Standard Count', 'Premium Count', 'WiFi Status'])
-    for event in events:
-        writer.writerow([
-            event.occurred_at.isoformat(),
-            event.device_timestamp or '',
-            event.event_type,
-            event.count_basic or 0,
-            event.count_standard or 0,
-            event.count_premium or 0,
-            'Connected' if event.wifi_status else 'Disconnected'
-        ])
     return response
 
 
+def _truncate(*models):
+    """Empty the given tables: TRUNCATE on Postgres, one fast-path DELETE per table elsewhere (SQLite)."""
+    if connection.vendor == 'postgresql':
+        tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in models)
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE")
+    else:
+        for model in models:
+            model.objects.all().delete()
+
+
 @api_view(["POST"])
 @permission_classes([permissions.AllowAny])
 def flush_all_data(request):
     try:
         with transaction.atomic():
-            TelemetryEvent.objects.all().delete()
-            UsageStatistics.objects.all().delete()
-            DeviceStatus.objects.all().delete()
+            _truncate(TelemetryEvent, UsageStatistics, DeviceStatus)
+        invalidate_devices_payload()
         return Response({"status": "flushed"})
     except Exception as e:
         return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -212,15 +295,13 @@ def flush_all_but_admin(request):
     try:
         with transaction.atomic():
             # Delete domain data
-            TelemetryEvent.objects.all().delete()
-            UsageStatistics.objects.all().delete()
-            DeviceStatus.objects.all().delete()
             # MachineDevice model removed - devices are now directly linked to machines
-            Machine.objects.all().delete()
-            Device.objects.all().delete()
+            _truncate(TelemetryEvent, UsageStatistics, DeviceStatus, Machine, Device)
 
             # Delete all users except username 'admin'
-            User.objects.exclude(username='admin').delete()
+            get_user_model().objects.exclude(username='admin').delete()
+        # TRUNCATE skips Device signals, so drop every cached token, poll and payload entry
+        cache.clear()
         return Response({"status": "flushed_except_admin"})
     except Exception as e:
         return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -233,23 +314,30 @@ def handshake(request):
     firmware = (request.data.get("firmware") or "").strip()
     if not mac:
         return Response({"detail": "mac required"}, status=status.HTTP_400_BAD_REQUEST)
-    device = Device.objects.filter(mac=mac).first()
-    if not device:
-        device = Device.objects.create(
-            mac=mac, device_id=mac, token=secrets.token_urlsafe(24), assigned=False, firmware=firmware
+    now = timezone.now()
+    # Device and DeviceStatus upserts commit together
+    with transaction.atomic():
+        device = Device.objects.filter(mac=mac).first()
+        if not device:
+            device = Device.objects.create(
+                mac=mac, device_id=mac, token=secrets.token_urlsafe(24), assigned=False,
+                firmware=firmware, last_seen=now,
+            )
+        else:
+            # Update device_id to match MAC if it was previously different
+            if device.device_id != mac:
+                device.device_id = mac
+            device.firmware = firmware or device.firmware
+            device.last_seen = now
+            device.save(update_fields=['device_id', 'firmware', 'last_seen'])
+        # Same single-statement upsert as iot_ingest
+        DeviceStatus.objects.bulk_create(
+            [DeviceStatus(device_id=device.device_id, wifi_connected=True, device_timestamp=None)],
+            update_conflicts=True,
+            unique_fields=['device_id'],
+            update_fields=['wifi_connected', 'device_timestamp', 'last_seen'],
         )
-    else:
-        # Update device_id to match MAC if it was previously different
-        if device.device_id != mac:
-            device.device_id = mac
-        device.firmware = firmware or device.firmware
-        device.last_seen = timezone.now()
-        device.save()
-    ds, _ = DeviceStatus.objects.get_or_create(device_id=device.device_id)
-    ds.wifi_connected = True
-    ds.last_seen = timezone.now()
-    ds.device_timestamp = None
-    ds.save()
+    invalidate_devices_payload()
     return Response({
         "device_id": device.device_id,
         "token": device.token,
@@ -257,20 +345,58 @@ def handshake(request):
     })
 
 
-def _auth_device(request):
+DEVICE_AUTH_CACHE_TTL = 60
+
+
+def _device_auth_cache_key(token):
+    return f"authdev:{hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _auth_device_ref(request):
+    """Return (pk, device_id) for the bearer token, caching the Device lookup.
+
+    Only the two identifiers are cached, not the ORM instance; callers that
+    need to write to the Device row must load it themselves.
+    """
     auth = request.META.get("HTTP_AUTHORIZATION", "")
     if not auth.lower().startswith("bearer "):
         return None
     token = auth.split(" ", 1)[1].strip()
-    return Device.objects.filter(token=token, assigned=True).first()
+    key = _device_auth_cache_key(token)
+    ref = cache.get(key)
+    if ref is None:
+        device = Device.objects.filter(token=token, assigned=True).only('id', 'device_id').first()
+        if not device:
+            return None
+        ref = (device.pk, device.device_id)
+        cache.set(key, ref, DEVICE_AUTH_CACHE_TTL)
+    return ref
+
+
+def invalidate_device_auth(token):
+    """Drop the cached auth entry for a token; called from the Device save/delete signals."""
+    if token:
+        cache.delete(_device_auth_cache_key(token))
+
+
+# Dashboard tables re-fetch the device lists every second; serve them from cache between writes
+DEVICES_PAYLOAD_CACHE_TTL = 15
+_DEVICES_DATA_CACHE_KEY = 'devices_data_api'
+_DEVICES_ONLINE_CACHE_KEY = 'devices_online_api'
+
+
+def invalidate_devices_payload():
+    """Drop the cached device list payloads after device, status or binding changes."""
+    cache.delete_many([_DEVICES_DATA_CACHE_KEY, _DEVICES_ONLINE_CACHE_KEY])
 
 
 @api_view(["POST"])
 @permission_classes([permissions.AllowAny])
 def events(request):
-    device = _auth_device(request)
-    if not device:
+    ref = _auth_device_ref(request)
+    if not ref:
         return Response({"detail": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+    device_pk, device_id = ref
     data = request.data
     event_id = (data.get("event_id") or "").strip()
     event = (data.get("event") or "").strip()
@@ -279,75 +405,97 @@ def events(request):
     ts = data.get("ts")
     current_counters = data.get("current_counters", {})
     
-    # Debug logging
-    print(f"🔍 EVENTS DEBUG: device_id={device.device_id}, event_id={event_id}, treatment={treatment}, counter={counter}")
-    print(f"🔍 CURRENT COUNTERS: {current_counters}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Event from device %s: event_id=%s treatment=%s counter=%s current_counters=%s",
+            device_id, event_id, treatment, counter, current_counters
+        )
     if not event_id:
         return Response({"detail": "event_id required"}, status=status.HTTP_400_BAD_REQUEST)
-    if event != "treatment" or treatment not in {"BASIC", "STANDARD", "PREMIUM"}:
+    if event != "treatment" or treatment not in _TREATMENTS:
         return Response({"detail": "invalid event/treatment"}, status=status.HTTP_400_BAD_REQUEST)
     try:
         counter = int(counter)
     except Exception:
         return Response({"detail": "counter must be int"}, status=status.HTTP_400_BAD_REQUEST)
-    existing = TelemetryEvent.objects.filter(event_id=event_id).first()
-    if existing:
-        print(f"🔍 DUPLICATE EVENT: event_id={event_id} already exists, skipping")
-        return Response({"ack": True, "event_id": event_id})
+    # Event insert, device/status updates and daily stats commit together
     occurred_at = _parse_timestamp(ts) or timezone.now()
-    TelemetryEvent.objects.create(
-        device_id=device.device_id,
-        event_id=event_id,
-        event=event,
-        treatment=treatment,
-        counter=counter,
-        occurred_at=occurred_at,
-        event_type=treatment,
-        count_basic=None,
-        count_standard=None,
-        count_premium=None,
-        device_timestamp=ts,
-        wifi_status=True,
-        payload={},
-    )
-    # Update device last_seen
-    device.last_seen = timezone.now()
-    device.save()
-    
-    ds, _ = DeviceStatus.objects.get_or_create(device_id=device.device_id)
-    ds.wifi_connected = True
-    ds.device_timestamp = ts
-    ds.last_seen = timezone.now()
-    
-    # Update counters - prioritize current_counters if provided, otherwise use individual counter
-    if current_counters:
-        # Use the complete current_counters object
-        ds.current_count_basic = current_counters.get("basic", ds.current_count_basic)
-        ds.current_count_standard = current_counters.get("standard", ds.current_count_standard)
-        ds.current_count_premium = current_counters.get("premium", ds.current_count_premium)
-        print(f"🔍 UPDATED FROM CURRENT_COUNTERS: Basic={ds.current_count_basic}, Standard={ds.current_count_standard}, Premium={ds.current_count_premium}")
-    else:
-        # Fallback to individual counter update (legacy behavior)
-        if treatment == "BASIC":
-            ds.current_count_basic = counter
-        elif treatment == "STANDARD":
-            ds.current_count_standard = counter
-        elif treatment == "PREMIUM":
-            ds.current_count_premium = counter
-        print(f"🔍 UPDATED FROM INDIVIDUAL COUNTER: {treatment}={counter}")
-    
-    ds.save()
-    _update_daily_statistics(device.device_id, treatment, occurred_at)
-    print(f"✅ EVENT CREATED: {treatment} treatment, counter={counter}, new counts: Basic={ds.current_count_basic}, Standard={ds.current_count_standard}, Premium={ds.current_count_premium}")
+    with transaction.atomic():
+        # event_id is unique, so the INSERT itself rejects retransmitted events. savepoint=False
+        # marks the outer block for rollback on conflict without extra SAVEPOINT round-trips.
+        try:
+            with transaction.atomic(savepoint=False):
+                TelemetryEvent.objects.create(
+                    device_id=device_id,
+                    event_id=event_id,
+                    event=event,
+                    treatment=treatment,
+                    counter=counter,
+                    occurred_at=occurred_at,
+                    event_type=treatment,
+                    count_basic=None,
+                    count_standard=None,
+                    count_premium=None,
+                    device_timestamp=ts,
+                    wifi_status=True,
+                    payload={},
+                )
+        except IntegrityError:
+            logger.debug("Duplicate event %s, skipping", event_id)
+            return Response({"ack": True, "event_id": event_id})
+        # Device and DeviceStatus are touched with plain UPDATEs; no row is read back
+        now = timezone.now()
+        Device.objects.filter(pk=device_pk).update(last_seen=now)
+
+        # Update counters - prioritize current_counters if provided, otherwise use individual counter
+        if current_counters:
+            # Use the complete current_counters object
+            counts = {
+                f"current_count_{key}": current_counters[key]
+                for key in ("basic", "standard", "premium") if key in current_counters
+            }
+        else:
+            # Fallback to individual counter update (legacy behavior)
+            counts = {f"current_count_{treatment.lower()}": counter}
+        ds_fields = {'wifi_connected': True, 'device_timestamp': ts, 'last_seen': now, **counts}
+        if not DeviceStatus.objects.filter(device_id=device_id).update(**ds_fields):
+            DeviceStatus.objects.get_or_create(device_id=device_id, defaults=ds_fields)
+        _update_daily_statistics(device_id, treatment, occurred_at)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Event created: %s treatment, counter=%s, counts %s", treatment, counter, counts)
+    invalidate_devices_payload()
     return Response({"ack": True, "event_id": event_id})
 
 
+def _status_map(device_ids):
+    """DeviceStatus rows for the listed devices only, keyed by device_id."""
+    return DeviceStatus.objects.filter(device_id__in=device_ids).only(
+        'device_id', 'last_poll', 'last_seen',
+        'current_count_basic', 'current_count_standard', 'current_count_premium'
+    ).in_bulk(field_name='device_id')
+
+
 @api_view(["GET"]) 
 @permission_classes([permissions.AllowAny])
 def devices_data_api(request):
-    devices = Device.objects.all().order_by('-last_seen', 'device_id')
+    return Response({'devices': cache.get_or_set(_DEVICES_DATA_CACHE_KEY, _build_devices_data, DEVICES_PAYLOAD_CACHE_TTL)})
+
+
+def _build_devices_data():
+    devices = list(Device.objects.select_related('machine__outlet').order_by('-last_seen', 'device_id'))
     context_devices = []
-    status_map = {ds.device_id: ds for ds in DeviceStatus.objects.all()}
+    status_map = _status_map([d.device_id for d in devices])
+    # DB totals for devices without reported counters, in one GROUP BY instead of three counts per device
+    event_counts = defaultdict(lambda: {'BASIC': 0, 'STANDARD': 0, 'PREMIUM': 0})
+    missing_ids = [d.device_id for d in devices if d.device_id not in status_map]
+    if missing_ids:
+        rows = TelemetryEvent.objects.filter(
+            device_id__in=missing_ids,
+            event_type__in=['BASIC', 'STANDARD', 'PREMIUM']
+        ).values('device_id', 'event_type').annotate(c=Count('id')).order_by()
+        for row in rows:
+            event_counts[row['device_id']][row['event_type']] = row['c']
+    now = timezone.now()
     for d in devices:
         ds = status_map.get(d.device_id)
         # Prefer device-reported accumulated counters (ESP32), fallback to DB totals
@@ -358,11 +506,11 @@ def devices_data_api(request):
         else:
             basic_count = standard_count = premium_count = None
         if basic_count is None:
-            basic_count = TelemetryEvent.objects.filter(device_id=d.device_id, event_type='BASIC').count()
+            basic_count = event_counts[d.device_id]['BASIC']
         if standard_count is None:
-            standard_count = TelemetryEvent.objects.filter(device_id=d.device_id, event_type='STANDARD').count()
+            standard_count = event_counts[d.device_id]['STANDARD']
         if premium_count is None:
-            premium_count = TelemetryEvent.objects.filter(device_id=d.device_id, event_type='PREMIUM').count()
+            premium_count = event_counts[d.device_id]['PREMIUM']
 
         # Get bound machine using direct relationship (OneToOne can raise RelatedObjectDoesNotExist)
         bound_machine = None
@@ -386,7 +534,7 @@ def devices_data_api(request):
             'firmware': d.firmware,
             'last_seen': ds.last_poll if ds and ds.last_poll else (ds.last_seen if ds else d.last_seen),
             # Determine device status based on last_seen
-            'status': _get_device_status(ds),
+            'status': _get_device_status(ds, now),
             'bound_machine': bound_machine,
             'counts': {
                 'basic': basic_count,
@@ -394,58 +542,66 @@ def devices_data_api(request):
                 'premium': premium_count,
             }
         })
-    return Response({'devices': context_devices})
+    return context_devices
 
 
 @api_view(["GET"]) 
 @permission_classes([permissions.AllowAny])
 def devices_online_api(request):
     """Return only online devices"""
-    devices = Device.objects.all().order_by('-last_seen', 'device_id')
+    return Response({'devices': cache.get_or_set(_DEVICES_ONLINE_CACHE_KEY, _build_devices_online, DEVICES_PAYLOAD_CACHE_TTL)})
+
+
+def _build_devices_online():
+    # Same rule as _get_device_status, evaluated in SQL: last_poll (or last_seen when the
+    # device never polled) inside the online window
+    cutoff = timezone.now() - ONLINE_WINDOW
+    status_map = DeviceStatus.objects.filter(
+        Q(last_poll__gte=cutoff) | Q(last_poll__isnull=True, last_seen__gte=cutoff)
+    ).only(
+        'device_id', 'last_poll', 'last_seen',
+        'current_count_basic', 'current_count_standard', 'current_count_premium'
+    ).in_bulk(field_name='device_id')
+    devices = Device.objects.filter(device_id__in=list(status_map)).order_by('-last_seen', 'device_id')
     context_devices = []
-    status_map = {ds.device_id: ds for ds in DeviceStatus.objects.all()}
     for d in devices:
-        ds = status_map.get(d.device_id)
-        # Only include devices that are online (within 5 minutes)
-        device_status = _get_device_status(ds)
-        if device_status == 'online':
-            context_devices.append({
-                'device_id': d.device_id,
-                'mac': d.mac,
-                'assigned': d.assigned,
-                'firmware': d.firmware,
-                'last_seen': ds.last_poll if ds and ds.last_poll else (ds.last_seen if ds else d.last_seen),
-                'online': True,
-                'counts': {
-                    'basic': getattr(ds, 'current_count_basic', None) if ds else None,
-                    'standard': getattr(ds, 'current_count_standard', None) if ds else None,
-                    'premium': getattr(ds, 'current_count_premium', None) if ds else None,
-                }
-            })
-    return Response({'devices': context_devices})
+        ds = status_map[d.device_id]
+        context_devices.append({
+            'device_id': d.device_id,
+            'mac': d.mac,
+            'assigned': d.assigned,
+            'firmware': d.firmware,
+            'last_seen': ds.last_poll or ds.last_seen,
+            'online': True,
+            'counts': {
+                'basic': ds.current_count_basic,
+                'standard': ds.current_count_standard,
+                'premium': ds.current_count_premium,
+            }
+        })
+    return context_devices
 
 
 @api_view(["GET"]) 
 @permission_classes([permissions.AllowAny])
 def machines_unregistered_api(request):
     """Return machines that have no active device assigned"""
-    # Get all machines that don't have any device assigned
-    unregistered_machines = Machine.objects.filter(device__isnull=True).order_by('outlet__name', 'name')
+    # Get all machines that don't have any device assigned, outlet joined in the same query
+    unregistered_machines = Machine.objects.filter(device__isnull=True).order_by(
+        'outlet__outlet_name', 'machine_code'
+    ).values('machine_id', 'machine_code', 'outlet_id', 'outlet__outlet_name', 'is_active', 'installed_at')
     
-    machines_data = []
-    for machine in unregistered_machines:
-        machines_data.append({
-            'id': machine.id,
-            'name': machine.name or f'Machine-{machine.id}',
-            'outlet_name': machine.outlet.name if machine.outlet else 'No outlet',
-            'outlet_id': machine.outlet.id if machine.outlet else None,
-            'machine_type': machine.machine_type,
-            'is_active': machine.is_active,
-            'installed_date': machine.installed_date,
-            'last_maintenance': machine.last_maintenance,
-            'created_at': machine.created_at,
-            'updated_at': machine.updated_at,
-        })
+    machines_data = [
+        {
+            'id': machine['machine_id'],
+            'name': machine['machine_code'] or f"Machine-{machine['machine_id']}",
+            'outlet_name': machine['outlet__outlet_name'] or 'No outlet',
+            'outlet_id': machine['outlet_id'],
+            'is_active': machine['is_active'],
+            'installed_date': machine['installed_at'],
+        }
+        for machine in unregistered_machines
+    ]
     
     return Response({'machines': machines_data})
 
@@ -474,7 +630,7 @@ def bind_device_to_machine(request):
         # Unassign device from any existing machine
         if device.machine:
             device.machine.device = None
-            device.machine.save()
+            device.machine.save(update_fields=['device'])
 
         # Unassign any existing device from the target machine
         if machine.device:
@@ -483,11 +639,12 @@ def bind_device_to_machine(request):
 
         # Create the binding
         machine.device = device
-        machine.save()
+        machine.save(update_fields=['device'])
 
         # Mark device as assigned
         device.assigned = True
-        device.save()
+        device.save(update_fields=['assigned'])
+        invalidate_devices_payload()
 
         if not machine.outlet_id:
             return Response({"status": "bound", "warning": "Machine has no outlet; assign outlet to include in outlet totals"})
@@ -0,0 +1,33 @@
+"""
+orjson-backed JSON renderer for the API
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speed-up; without it DRF's stdlib renderer is used
+    orjson = None
+
+# Datetimes are passed through to DRF's encoder so the timestamp format the ESP32 firmware
+# parses follows JSONRenderer exactly, not orjson's own rules. Non-str keys match stdlib json.
+_ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Render API responses with orjson when it is installed.
+
+    Datetimes and types orjson does not know (Decimal, timedelta, lazy
+    strings, ...) go through DRF's JSONEncoder, so the bytes match
+    JSONRenderer whether or not orjson is present.
+    """
+
+    _default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=self._default, option=_ORJSON_OPTIONS)
+
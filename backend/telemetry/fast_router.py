@@ -0,0 +1,101 @@
+"""
+Segment trie router for the ESP32 command endpoints under /api/device/
+"""
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+
+from ozontelemetry.urls import _DEVICE_COMMAND_ROUTES, _DEVICE_COMMANDS_PREFIX
+
+# Sentinel keys so they can never collide with a literal path segment
+_PARAM = object()
+_VIEW = object()
+
+# Mounted under path('api/', include([...])) in ozontelemetry/urls.py
+_API_PREFIX = 'api/'
+
+# The trie only models <str:...> (or bare <...>) captures, i.e. one non-empty segment
+_STR_PARAM_RE = re.compile(r'^<(?:str:)?(\w+)>$')
+
+
+def _segments(route):
+    """Split a path() route into trie segments; captures become (name,) tuples."""
+    segments = []
+    for part in route.strip('/').split('/'):
+        if not part:
+            continue
+        if '<' in part:
+            m = _STR_PARAM_RE.match(part)
+            if m is None:
+                raise ImproperlyConfigured(f"fast_router cannot model route segment {part!r}")
+            segments.append((m.group(1),))
+        else:
+            segments.append(part)
+    return segments
+
+
+def _build_trie(prefix, routes):
+    root = {}
+    base = _segments(prefix)
+    for route, view, _name in routes:
+        node = root
+        for segment in base + _segments(route):
+            if isinstance(segment, tuple):
+                param = node.get(_PARAM)
+                if param is None:
+                    param = node[_PARAM] = (segment[0], {})
+                elif param[0] != segment[0]:
+                    raise ImproperlyConfigured(f"conflicting captures {param[0]!r} and {segment[0]!r}")
+                node = param[1]
+            else:
+                node = node.setdefault(segment, {})
+        node[_VIEW] = view
+    return root
+
+
+_TRIE = _build_trie(_API_PREFIX + _DEVICE_COMMANDS_PREFIX, _DEVICE_COMMAND_ROUTES)
+
+
+def match(path):
+    """Return (view, kwargs) for path, or (None, None) when the trie has no route."""
+    # Every route in the table ends in '/'; APPEND_SLASH redirects are Django's job
+    if not path.startswith('/') or not path.endswith('/'):
+        return None, None
+    node = _TRIE
+    kwargs = {}
+    for part in path[1:-1].split('/'):
+        child = node.get(part)
+        if child is None:
+            param = node.get(_PARAM)
+            # Empty segments never match a <str:...> converter
+            if param is None or not part:
+                return None, None
+            name, child = param
+            kwargs[name] = part
+        node = child
+    view = node.get(_VIEW)
+    if view is None:
+        return None, None
+    return view, kwargs
+
+
+class FastDeviceRouterMiddleware:
+    """Dispatch ESP32 command polling straight to its view, skipping the URL resolver.
+
+    The trie is built from the route table in ozontelemetry/urls.py; paths it
+    does not know fall through to Django's normal resolution.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        path = request.path_info
+        if path.startswith('/api/device/'):
+            view, kwargs = match(path)
+            if view is not None:
+                response = view(request, **kwargs)
+                if hasattr(response, 'render') and callable(response.render):
+                    response = response.render()
+                return response
+        return self.get_response(request)
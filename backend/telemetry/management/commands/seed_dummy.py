@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
 import random
 from datetime import timedelta
@@ -23,6 +24,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("--events", type=int, default=12430, help="Number of treatment events to generate")
 
+    @transaction.atomic
     def handle(self, *args, **options):
         num_events = options["events"]
 
@@ -67,36 +69,34 @@ class Command(BaseCommand):
             )
             m.device = d
             m.save(update_fields=["device"])
-            # Initialize status
-            DeviceStatus.objects.create(
-                device_id=d.device_id,
-                wifi_connected=True,
-                current_count_basic=0,
-                current_count_standard=0,
-                current_count_premium=0,
-                last_seen=timezone.now(),
-            )
             devices.append(d)
 
         # Prepare per-device counters per treatment
         per_device_counts = {
             d.device_id: {"BASIC": 0, "STANDARD": 0, "PREMIUM": 0} for d in devices
         }
+        # Running total per device, so event ids don't re-sum the treatment counters
+        per_device_total = {d.device_id: 0 for d in devices}
 
         # Distribute events over the last 30 days
         now = timezone.now()
-        for _ in range(num_events):
-            d = random.choice(devices)
-            t = random.choices(["BASIC", "STANDARD", "PREMIUM"], weights=[6, 3, 2])[0]
-            per_device_counts[d.device_id][t] += 1
-            counter_val = per_device_counts[d.device_id][t]
+        # Draw every event's device, treatment and time offset up front in batched calls
+        device_ids = random.choices([d.device_id for d in devices], k=num_events)
+        treatments = random.choices(["BASIC", "STANDARD", "PREMIUM"], weights=[6, 3, 2], k=num_events)
+        day_offsets = random.choices(range(31), k=num_events)
+        minute_offsets = random.choices(range(1441), k=num_events)
+        events = []
+        for did, t, days, minutes in zip(device_ids, treatments, day_offsets, minute_offsets):
+            counts = per_device_counts[did]
+            counts[t] += 1
+            counter_val = counts[t]
             # Make a unique id using overall sum of this device counters
-            total_for_device = sum(per_device_counts[d.device_id].values())
-            event_id = f"{d.device_id}-{total_for_device:010d}"
-            occurred_at = now - timedelta(days=random.randint(0, 30), minutes=random.randint(0, 1440))
+            per_device_total[did] += 1
+            event_id = f"{did}-{per_device_total[did]:010d}"
+            occurred_at = now - timedelta(days=days, minutes=minutes)
 
-            TelemetryEvent.objects.create(
-                device_id=d.device_id,
+            events.append(TelemetryEvent(
+                device_id=did,
                 event_id=event_id,
                 event="treatment",
                 treatment=t,
@@ -109,16 +109,21 @@ class Command(BaseCommand):
                 device_timestamp=str(int(occurred_at.timestamp())),
                 wifi_status=True,
                 payload={},
-            )
+            ))
+        TelemetryEvent.objects.bulk_create(events, batch_size=1000)
 
-        # Update DeviceStatus totals
-        for d in devices:
-            ds = DeviceStatus.objects.get(device_id=d.device_id)
-            ds.current_count_basic = per_device_counts[d.device_id]["BASIC"]
-            ds.current_count_standard = per_device_counts[d.device_id]["STANDARD"]
-            ds.current_count_premium = per_device_counts[d.device_id]["PREMIUM"]
-            ds.last_seen = now
-            ds.save()
+        # Status rows are created once the totals are known, so they need no follow-up UPDATEs
+        DeviceStatus.objects.bulk_create([
+            DeviceStatus(
+                device_id=d.device_id,
+                wifi_connected=True,
+                current_count_basic=per_device_counts[d.device_id]["BASIC"],
+                current_count_standard=per_device_counts[d.device_id]["STANDARD"],
+                current_count_premium=per_device_counts[d.device_id]["PREMIUM"],
+                last_seen=now,
+            )
+            for d in devices
+        ])
 
         self.stdout.write(self.style.SUCCESS(
             f"Seed complete: {len(outlets)} outlets, {len(machines)} machines, {len(devices)} devices, {num_events} events"
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-15 22:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetry', '0014_devicestatus_last_poll'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='command',
+            name='telemetry_c_device__326cc0_idx',
+        ),
+        migrations.AddIndex(
+            model_name='command',
+            index=models.Index(fields=['device', 'status', 'expires_at'], name='telemetry_c_device__43eb70_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='command',
+            index=models.Index(fields=['device', 'status', '-priority', 'created_at'], name='telemetry_c_device__b089af_idx'),
+        ),
+    ]
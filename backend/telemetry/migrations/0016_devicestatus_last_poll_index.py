@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-15 22:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetry', '0015_command_poll_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='devicestatus',
+            name='last_poll',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Last time ESP32 polled for commands', null=True),
+        ),
+    ]
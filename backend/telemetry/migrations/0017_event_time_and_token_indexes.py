@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-15 22:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetry', '0016_devicestatus_last_poll_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='device',
+            name='token',
+            field=models.CharField(blank=True, help_text='Authentication token', max_length=128, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='telemetryevent',
+            index=models.Index(fields=['device_id', 'occurred_at', 'event_type'], name='telemetry_t_device__9e6bdc_idx'),
+        ),
+    ]
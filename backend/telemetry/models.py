@@ -53,7 +53,7 @@ class Device(models.Model):
     mac = models.CharField(max_length=17, unique=True, help_text="MAC address of the ESP32 device", default="00:00:00:00:00:00")
     device_id = models.CharField(max_length=100, unique=True, help_text="Unique device identifier")
     firmware = models.CharField(max_length=50, blank=True, null=True, help_text="Firmware version")
-    token = models.CharField(max_length=128, blank=True, null=True, help_text="Authentication token")
+    token = models.CharField(max_length=128, unique=True, blank=True, null=True, help_text="Authentication token")
     assigned = models.BooleanField(default=False, help_text="Whether device is assigned to a machine")
     last_seen = models.DateTimeField(blank=True, null=True, help_text="Last time device was seen online")
     notes = models.TextField(blank=True, null=True, help_text="Additional notes about the device")
@@ -113,7 +113,7 @@ class DeviceStatus(models.Model):
     uptime_seconds = models.IntegerField(default=0)
     device_timestamp = models.CharField(max_length=50, blank=True, null=True)
     last_seen = models.DateTimeField(auto_now=True)
-    last_poll = models.DateTimeField(null=True, blank=True, help_text="Last time ESP32 polled for commands")
+    last_poll = models.DateTimeField(null=True, blank=True, db_index=True, help_text="Last time ESP32 polled for commands")
 
     class Meta:
         ordering = ['-last_seen']
@@ -168,6 +168,11 @@ class TelemetryEvent(models.Model):
 
     class Meta:
         ordering = ['-occurred_at']
+        indexes = [
+            # Serves device_id lookups and per-device time ranges (export, logs); event_type makes
+            # per-type counts over a range (device detail usage stats) index-only
+            models.Index(fields=['device_id', 'occurred_at', 'event_type']),
+        ]
 
     def __str__(self):
         return f"{self.device_id}: {self.event_type} at {self.occurred_at}"
@@ -250,7 +255,9 @@ class Command(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['device', 'status']),
+            # Pending-command poll: equality on (device, status), range on expires_at / ordered scan
+            models.Index(fields=['device', 'status', 'expires_at']),
+            models.Index(fields=['device', 'status', '-priority', 'created_at']),
             models.Index(fields=['status', 'priority']),
             models.Index(fields=['created_at']),
         ]
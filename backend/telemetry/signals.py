@@ -0,0 +1,27 @@
+"""
+Keep the per-token device auth cache in step with Device writes
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from telemetry.api.ingest import invalidate_device_auth
+from telemetry.models import Device
+
+
+@receiver(pre_save, sender=Device)
+def forget_replaced_token(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Drop the cache entry of a token that is being rotated away."""
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and 'token' not in update_fields:
+        return
+    old_token = Device.objects.filter(pk=instance.pk).values_list('token', flat=True).first()
+    if old_token != instance.token:
+        invalidate_device_auth(old_token)
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def forget_device_token(sender, instance, **kwargs):
+    """Assignment or deletion changes whether the token authenticates."""
+    invalidate_device_auth(instance.token)
@@ -1,3 +1,269 @@
-from django.test import TestCase
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from telemetry import fast_router
+from telemetry.api import renderers
+from telemetry.api.commands import PENDING_COMMANDS_CACHE_TTL, invalidate_pending_commands
+from telemetry.api.ingest import _parse_device_timestamp
+from telemetry.models import Command, Device, DeviceStatus, TelemetryEvent, UsageStatistics
+from ozontelemetry.urls import _DEVICE_COMMAND_ROUTES
+
+
+class FastRouterParityTests(SimpleTestCase):
+    """The trie must dispatch exactly like django.urls.resolve for device command routes."""
+
+    PATHS = [
+        '/api/device/AA:BB/commands/',
+        '/api/device/AA:BB/commands/create/',
+        '/api/device/AA:BB/commands/status/',
+        '/api/device/AA:BB/commands/cmd-1/',
+        '/api/device/dev-1/commands/null/',
+        # Near misses the trie must leave to Django
+        '/api/device/AA:BB/commands',
+        '/api/device/AA:BB/commands/cmd-1',
+        '/api/device//commands/',
+        '/api/device/AA:BB/commands//',
+        '/api/device/AA:BB/commands/cmd-1/extra/',
+        '/api/device/AA:BB/',
+        '/api/device/events/',
+        '/api/devices/',
+    ]
+
+    def _resolve(self, path):
+        try:
+            return resolve(path)
+        except Resolver404:
+            return None
+
+    def test_matches_resolve(self):
+        for path in self.PATHS:
+            with self.subTest(path=path):
+                view, kwargs = fast_router.match(path)
+                if view is None:
+                    continue
+                resolved = self._resolve(path)
+                self.assertIsNotNone(resolved)
+                self.assertIs(view, resolved.func)
+                self.assertEqual(kwargs, resolved.kwargs)
+
+    def test_every_device_command_route_is_routed(self):
+        routed = {fast_router.match(path)[0] for path in self.PATHS}
+        for _route, view, name in _DEVICE_COMMAND_ROUTES:
+            with self.subTest(route=name):
+                self.assertIn(view, routed)
+
+    def test_requires_trailing_slash(self):
+        self.assertEqual(fast_router.match('/api/device/AA:BB/commands'), (None, None))
+        self.assertEqual(fast_router.match('/api/device/AA:BB/commands/cmd-1'), (None, None))
+
+
+class RendererTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_html_accept_does_not_error(self):
+        response = self.client.get('/api/devices/', HTTP_ACCEPT='text/html')
+        self.assertNotEqual(response.status_code, 500)
+        response = self.client.get('/api/devices/', HTTP_ACCEPT='text/html,*/*;q=0.8')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'devices': []})
+
+    def test_output_is_identical_with_and_without_orjson(self):
+        data = {
+            'ack': True,
+            'count': 3,
+            'items': ['a', None, 'caf\u00e9'],
+            'timestamp': datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=dt_timezone.utc),
+            'created_at': datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+            'expires_at': datetime(2024, 1, 2, 3, 4, 5, 999),
+            'date': date(2024, 1, 2),
+            'amount': Decimal('1.50'),
+            'uptime': timedelta(seconds=90),
+            'nested': {'when': [datetime(2024, 1, 2, 3, 4, 5, 500000, tzinfo=dt_timezone.utc)]},
+        }
+        rendered = renderers.ORJSONRenderer().render(data)
+        with mock.patch.object(renderers, 'orjson', None):
+            fallback = renderers.ORJSONRenderer().render(data)
+        expected = JSONRenderer().render(data)
+        self.assertEqual(fallback, expected)
+        self.assertEqual(rendered, expected)
+
+
+class DeviceAuthCacheTests(TestCase):
+    """Cached token lookups must not outlive the Device state they were built from."""
+
+    def setUp(self):
+        cache.clear()
+        self.device = Device.objects.create(mac='AA:BB', device_id='AA:BB', token='tok-1', assigned=True)
+
+    def poll(self, token):
+        return self.client.get('/api/device/AA:BB/commands/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_rotated_token_stops_authenticating(self):
+        self.assertEqual(self.poll('tok-1').status_code, 200)
+        self.device.token = 'tok-2'
+        self.device.save()
+        self.assertEqual(self.poll('tok-1').status_code, 401)
+        self.assertEqual(self.poll('tok-2').status_code, 200)
+
+    def test_unassigned_device_stops_authenticating(self):
+        self.assertEqual(self.poll('tok-1').status_code, 200)
+        self.device.assigned = False
+        self.device.save()
+        self.assertEqual(self.poll('tok-1').status_code, 401)
+
+    def test_deleted_device_stops_authenticating(self):
+        self.assertEqual(self.poll('tok-1').status_code, 200)
+        self.device.delete()
+        self.assertEqual(self.poll('tok-1').status_code, 401)
+        response = self.client.post(
+            '/api/device/events/',
+            {'event_id': 'e1', 'event': 'treatment', 'treatment': 'BASIC', 'counter': '1'},
+            HTTP_AUTHORIZATION='Bearer tok-1',
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(TelemetryEvent.objects.exists())
+
+    def test_flush_except_admin_clears_cached_tokens(self):
+        self.assertEqual(self.poll('tok-1').status_code, 200)
+        self.assertEqual(self.client.post('/api/flush-except-admin/').status_code, 200)
+        self.assertFalse(Device.objects.exists())
+        self.assertEqual(self.poll('tok-1').status_code, 401)
+
+
+class DeviceEventTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Device.objects.create(mac='AA:BB', device_id='AA:BB', token='tok-1', assigned=True)
+
+    def post_event(self, event_id):
+        return self.client.post(
+            '/api/device/events/',
+            {'event_id': event_id, 'event': 'treatment', 'treatment': 'BASIC', 'counter': '5'},
+            HTTP_AUTHORIZATION='Bearer tok-1',
+        )
+
+    def test_duplicate_event_id_is_acked_and_stored_once(self):
+        first = self.post_event('e1')
+        second = self.post_event('e1')
+        for response in (first, second):
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {'ack': True, 'event_id': 'e1'})
+        self.assertEqual(TelemetryEvent.objects.filter(event_id='e1').count(), 1)
+        stats = UsageStatistics.objects.get(device_id='AA:BB')
+        self.assertEqual((stats.basic_count, stats.total_count), (1, 1))
+        self.assertEqual(DeviceStatus.objects.get(device_id='AA:BB').current_count_basic, 5)
+
+
+class IngestUpsertTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.last_poll = timezone.now() - timedelta(minutes=5)
+        DeviceStatus.objects.create(
+            device_id='AA:BB', rtc_available=True, sd_card_available=True,
+            uptime_seconds=42, last_poll=self.last_poll,
+        )
+
+    def ingest(self, **extra):
+        data = {'mode': 'status', 'macaddr': 'AA:BB', 'count1': '3', 'count2': '2', 'count3': '1', **extra}
+        response = self.client.post('/api/ingest/', data)
+        self.assertEqual(response.status_code, 200)
+        return DeviceStatus.objects.get(device_id='AA:BB')
+
+    def test_upsert_keeps_fields_the_payload_does_not_report(self):
+        ds = self.ingest()
+        self.assertEqual(DeviceStatus.objects.count(), 1)
+        self.assertEqual(
+            (ds.current_count_basic, ds.current_count_standard, ds.current_count_premium), (3, 2, 1)
+        )
+        self.assertTrue(ds.wifi_connected)
+        self.assertTrue(ds.rtc_available)
+        self.assertTrue(ds.sd_card_available)
+        self.assertEqual(ds.uptime_seconds, 42)
+        self.assertEqual(ds.last_poll, self.last_poll)
+
+    def test_upsert_overwrites_reported_flags(self):
+        ds = self.ingest(rtc_available='false', sd_available='false')
+        self.assertFalse(ds.rtc_available)
+        self.assertFalse(ds.sd_card_available)
+        self.assertEqual(ds.uptime_seconds, 42)
+
+    def test_upsert_creates_missing_row(self):
+        self.client.post('/api/ingest/', {'mode': 'BASIC', 'macaddr': 'CC:DD', 'count1': '7'})
+        ds = DeviceStatus.objects.get(device_id='CC:DD')
+        self.assertEqual(ds.current_count_basic, 7)
+        self.assertEqual(TelemetryEvent.objects.filter(device_id='CC:DD', event_type='BASIC').count(), 1)
+
+
+class PendingCommandsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Device.objects.create(mac='AA:BB', device_id='AA:BB', token='tok-1', assigned=True)
+        self.user = get_user_model().objects.create_user('operator', password='pw')
+
+    def poll(self):
+        response = self.client.get('/api/device/AA:BB/commands/', HTTP_AUTHORIZATION='Bearer tok-1')
+        self.assertEqual(response.status_code, 200)
+        return [command['command_type'] for command in response.json()['commands']]
+
+    def test_new_command_is_visible_on_next_poll(self):
+        # An empty poll caches "no pending commands" for this device
+        self.assertEqual(self.poll(), [])
+        self.client.force_login(self.user)
+        response = self.client.post(
+            '/api/device/AA:BB/commands/create/',
+            json.dumps({'command_type': 'RESET_COUNTERS'}),
+            content_type='application/json',
+        )
+        self.assertIn(response.status_code, (200, 201))
+        self.client.logout()
+        self.assertEqual(self.poll(), ['RESET_COUNTERS'])
+        # Delivered commands are marked sent and not handed out again
+        self.assertEqual(self.poll(), [])
+
+    def test_invalidate_pending_commands_drops_cached_empty_poll(self):
+        self.assertEqual(self.poll(), [])
+        Command.objects.create(
+            command_id='manual-1', device=Device.objects.get(device_id='AA:BB'), command_type='GET_STATUS'
+        )
+        invalidate_pending_commands('AA:BB')
+        self.assertEqual(self.poll(), ['GET_STATUS'])
+
+    def test_cached_empty_poll_expires_while_device_keeps_polling(self):
+        # A command created by another worker never invalidates this worker's marker;
+        # polls served from the marker must not keep pushing its expiry forward
+        clock = mock.Mock(return_value=1000.0)
+        with mock.patch('django.core.cache.backends.base.time.time', clock), \
+                mock.patch('django.core.cache.backends.locmem.time.time', clock):
+            self.assertEqual(self.poll(), [])
+            clock.return_value += PENDING_COMMANDS_CACHE_TTL * 0.75
+            self.assertEqual(self.poll(), [])
+            Command.objects.create(
+                command_id='other-worker-1', device=Device.objects.get(device_id='AA:BB'),
+                command_type='GET_STATUS',
+            )
+            clock.return_value += PENDING_COMMANDS_CACHE_TTL * 0.5
+            self.assertEqual(self.poll(), ['GET_STATUS'])
+
+
+class DeviceTimestampTests(SimpleTestCase):
+
+    def test_accepts_only_zero_padded_firmware_format(self):
+        parsed = _parse_device_timestamp('2024-01-02 03:04:05')
+        self.assertEqual(parsed, timezone.make_aware(datetime(2024, 1, 2, 3, 4, 5)))
+        for value in ('2024-1-2 03:04:05', '2024-01-02T03:04:05', '2024-01-02', '2024-13-02 03:04:05', '', None):
+            with self.subTest(value=value):
+                self.assertIsNone(_parse_device_timestamp(value))
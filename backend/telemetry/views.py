@@ -9,7 +9,12 @@ from django.contrib.auth.decorators import login_required
 from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
-from telemetry.api.ingest import _get_device_status
+from telemetry.api.ingest import _get_device_status, invalidate_devices_payload
+from telemetry.api.commands import invalidate_pending_commands
+
+# Constant JSON bodies for machine_logs_api, serialized once
+_MACHINE_NOT_FOUND_BYTES = b'{"error": "machine_not_found"}'
+_EMPTY_LOGS_BYTES = b'{"treatment_logs": [], "reset_commands": []}'
 
 
 @require_http_methods(["GET"])
@@ -188,6 +193,7 @@ def machines_page(request):
     # Convert machines to JSON for JavaScript
     import json
     machines_json = []
+    now = timezone.now()
     for machine in machines:
         machine_data = {
             'id': machine.machine_id,  # expose primary key as 'id' for JS
@@ -205,7 +211,7 @@ def machines_page(request):
             machine_data['device'] = {
                 'device_id': machine.device.device_id,
                 'mac': machine.device.mac,
-                'status': _get_device_status(ds) if ds else 'offline',
+                'status': _get_device_status(ds, now) if ds else 'offline',
                 'last_seen': ds.last_seen.isoformat() if ds and ds.last_seen else None,
             }
         
@@ -266,6 +272,7 @@ def outlet_assign_machine(request, outlet_id):
             m = Machine.objects.get(machine_id=machine_id)
             m.outlet = outlet
             m.save()
+            invalidate_devices_payload()
         except Machine.DoesNotExist:
             pass
     return redirect('outlet_manage', outlet_id=outlet.outlet_id)
@@ -351,6 +358,7 @@ def device_assign(request, device_id):
             # Update device assignment status
             device.assigned = True
             device.save()
+            invalidate_devices_payload()
             
         except Machine.DoesNotExist:
             pass
@@ -379,6 +387,7 @@ def device_unassign(request, device_id):
         # Update device assignment status (always clear the assigned flag)
         device.assigned = False
         device.save()
+        invalidate_devices_payload()
         
     except Device.DoesNotExist:
         pass
@@ -495,6 +504,7 @@ def create_command(request, device_id):
             expires_at=expires_at,
             created_by=request.user
         )
+        invalidate_pending_commands(device_id)
     
     return redirect('device_commands', device_id=device_id)
 
@@ -513,6 +523,7 @@ def machine_assign(request, machine_id):
         outlet = Outlet.objects.get(outlet_id=outlet_id)
         machine.outlet = outlet
         machine.save()
+        invalidate_devices_payload()
     except Outlet.DoesNotExist:
         pass
     
@@ -526,6 +537,7 @@ def machine_unassign(request, machine_id):
     machine = get_object_or_404(Machine, machine_id=machine_id)
     machine.outlet = None
     machine.save()
+    invalidate_devices_payload()
     return redirect('machines_page')
 
 
@@ -662,6 +674,7 @@ def machine_delete(request, machine_id):
         machine.device = None
     # Remove outlet link implicitly by deleting machine
     machine.delete()
+    invalidate_devices_payload()
     return redirect('machines_page')
 
 
@@ -671,13 +684,11 @@ def machine_logs_api(request, machine_id):
     try:
         machine = Machine.objects.get(machine_id=machine_id)
     except Machine.DoesNotExist:
-        from django.http import JsonResponse
-        return JsonResponse({'error': 'machine_not_found'}, status=404)
+        return HttpResponse(_MACHINE_NOT_FOUND_BYTES, content_type='application/json', status=404)
 
     device = machine.device
     if not device:
-        from django.http import JsonResponse
-        return JsonResponse({'treatment_logs': [], 'reset_commands': []})
+        return HttpResponse(_EMPTY_LOGS_BYTES, content_type='application/json')
 
     treatment_events = TelemetryEvent.objects.filter(
         device_id=device.device_id,